@@ -1,29 +1,268 @@
 import pandas as pd
 import os
+from io import BytesIO
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
 
+from form_manager import TASK_SCHEMA, TASK_COLUMNS, DATE_COLS, DATE_FORMATS
+
+MAX_APPEND_PARTS = 50
+
+# Key in the main file's Parquet metadata naming the newest append part folded into it
+FOLDED_KEY = b"folded_through"
+
+# Shared by all sessions of the server process so concurrent saves cannot interleave
+_write_lock = threading.Lock()
+
+def _path_for(path):
+    """
+    Returns the Parquet path used to persist the workbook at the given path.
+    """
+    return os.path.splitext(path)[0] + ".parquet"
+
+def _appends_dir(path):
+    """
+    Returns the directory holding rows appended since the last full save.
+    """
+    return os.path.splitext(path)[0] + "_appends"
+
+def _append_parts(path):
+    appends = _appends_dir(path)
+    if not os.path.isdir(appends):
+        return []
+    with os.scandir(appends) as entries:
+        return sorted(e.path for e in entries if e.name.endswith(".parquet"))
+
+def _store_mtime(path):
+    """
+    Returns modification times of the Parquet file and its appends directory.
+    """
+    appends = _appends_dir(path)
+    return (
+        os.path.getmtime(_path_for(path)),
+        os.path.getmtime(appends) if os.path.isdir(appends) else 0,
+    )
+
+def _arrow_safe(df):
+    """
+    Casts object columns holding mixed types (e.g. numbers and text) to strings,
+    which PyArrow cannot write as-is.
+    """
+    mixed = [
+        c for c in df.select_dtypes(include="object").columns
+        if pd.api.types.infer_dtype(df[c], skipna=True) in ("mixed", "mixed-integer")
+    ]
+    return df.astype({c: "string" for c in mixed}) if mixed else df
+
+def _check_dates(values, parsed, column, sheet_rows):
+    """
+    Raises ValueError if any non-blank value could not be parsed as a date,
+    rather than letting it become NaT and be lost on the next save. With
+    sheet_rows, the message gives spreadsheet row numbers (header is row 1).
+    """
+    text = values.astype("string").str.strip()
+    bad = parsed.isna() & text.notna() & (text != "")
+    if not bad.any():
+        return
+    examples = ", ".join(repr(v) for v in text[bad].unique()[:5])
+    if sheet_rows:
+        rows = ", ".join(str(i + 2) for i in bad[bad].index[:10])
+        raise ValueError(
+            f"{bad.sum()} value(s) in '{column}' are not dates (rows {rows}: {examples}). "
+            "Use YYYY-MM-DD or clear the cells, then reload the page."
+        )
+    raise ValueError(
+        f"{bad.sum()} saved value(s) in '{column}' are not dates ({examples}). "
+        "The saved data has been left unchanged."
+    )
+
+def _apply_schema(df, sheet_rows=False):
+    """
+    Casts the known task columns to their dtypes from TASK_SCHEMA, parsing
+    date columns that were stored as ISO text.
+    """
+    df = df.astype({
+        c: dtype for c, dtype in TASK_SCHEMA.items()
+        if c in df.columns and c not in DATE_COLS
+    })
+    for c in DATE_COLS:
+        if c in df.columns:
+            parsed = pd.to_datetime(df[c], errors="coerce", format="ISO8601")
+            _check_dates(df[c], parsed, c, sheet_rows)
+            df[c] = parsed.astype(TASK_SCHEMA[c])
+    return df
+
+def _empty_frame(columns):
+    """
+    Returns an empty DataFrame with the given columns, typed with TASK_SCHEMA so
+    rows added later keep their dtypes.
+    """
+    return _apply_schema(pd.DataFrame(columns=columns))
+
+def read_workbook(source):
+    """
+    Reads the first sheet of an Excel path or uploaded file, typed with TASK_SCHEMA.
+    """
+    text_schema = {c: dtype for c, dtype in TASK_SCHEMA.items() if c not in DATE_COLS}
+    with pd.ExcelFile(source, engine="calamine") as xl:
+        df = xl.parse(0, dtype=text_schema)
+    # Task numbering continues from the highest ID, so the sheet must provide one
+    if "ID No" not in df.columns:
+        raise ValueError("'ID No' column not found in the workbook.")
+    if not df.empty and df["ID No"].isna().all():
+        raise ValueError("'ID No' column has no values.")
+    return _apply_schema(df, sheet_rows=True)
+
+def _part_stamp(part):
+    """
+    Returns the time_ns stamp an append part is named after.
+    """
+    return int(os.path.splitext(os.path.basename(part))[0])
+
+def _atomic_to_parquet(df, target, metadata=None):
+    """
+    Writes to a temporary file and renames it over the target, so readers and
+    interrupted saves never see a half-written Parquet file.
+    """
+    tmp = target + ".tmp"
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    pq.write_table(table, tmp, compression="snappy")
+    os.replace(tmp, target)
+
+def _write_parquet(df, path):
+    """
+    Rewrites the main Parquet file and folds in the append parts. The newest
+    folded part is recorded in the file's metadata before any part is removed,
+    so a crash or a concurrent load in between never reads those rows twice.
+    """
+    parts = _append_parts(path)
+    folded = _part_stamp(parts[-1]) if parts else 0
+    _atomic_to_parquet(df, _path_for(path), {FOLDED_KEY: str(folded).encode()})
+    for part in parts:
+        os.remove(part)
+
+def _append_parquet(df, path):
+    os.makedirs(_appends_dir(path), exist_ok=True)
+    _atomic_to_parquet(df, os.path.join(_appends_dir(path), f"{time.time_ns()}.parquet"))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _read_upload_cached(data):
+    """
+    Parses uploaded workbook bytes; the bytes are the cache key, so re-running
+    the script or re-uploading the same file does not parse it again.
+    """
+    return read_workbook(BytesIO(data))
+
+def read_uploaded_workbook(uploaded_file):
+    """
+    Reads a workbook from a Streamlit UploadedFile, typed with TASK_SCHEMA.
+    If the file cannot be read, shows the error and returns an empty DataFrame.
+    """
+    try:
+        return _read_upload_cached(uploaded_file.getvalue())
+    except Exception as e:
+        st.error(f"❌ Error reading uploaded file: {e}")
+        return _empty_frame(TASK_COLUMNS)
+
+@st.cache_data(show_spinner=False)
+def _load_cached(path, mtime):
+    """
+    Reads the Parquet file for the given path plus any appended parts not yet
+    folded into it. The modification times are part of the cache key, so the
+    files are only parsed again after they change on disk.
+    """
+    main = pq.read_table(_path_for(path))
+    folded = int((main.schema.metadata or {}).get(FOLDED_KEY, b"0"))
+    parts = [pq.read_table(p) for p in _append_parts(path) if _part_stamp(p) > folded]
+    df = pd.concat([t.to_pandas() for t in [main, *parts]], ignore_index=True)
+    return _apply_schema(df)
+
 def load_excel(path, columns):
     """
-    Loads an Excel file from the given path.
+    Loads the task data stored for the given path.
+    Reads the Parquet copy if present; otherwise reads the first sheet of the legacy Excel file and converts it.
     If the file is missing or invalid, returns an empty DataFrame with the expected columns.
+    An invalid file is recorded so save_excel will not overwrite it with that empty frame.
     """
+    unreadable = st.session_state.setdefault("unreadable_stores", set())
+    unreadable.discard(path)
     try:
-        df = pd.read_excel(path)
-        st.write(f"📋 {len(df.columns)} columns detected:", df.columns.tolist())
+        parquet_path = _path_for(path)
+        if os.path.exists(parquet_path):
+            df = _load_cached(path, _store_mtime(path))
+        else:
+            df = read_workbook(path)
+            try:
+                _write_parquet(df, path)
+            except Exception as e:
+                st.warning(f"⚠️ Could not convert {path} to Parquet: {e}")
+        if st.session_state.get("debug"):
+            st.write(f"📋 {len(df.columns)} columns detected:", df.columns.tolist())
         return df
     except FileNotFoundError:
         st.error(f"⚠️ File not found: {path}. Creating empty DataFrame.")
-        return pd.DataFrame(columns=columns)
+        return _empty_frame(columns)
     except Exception as e:
         st.error(f"❌ Error loading Excel file: {e}")
-        return pd.DataFrame(columns=columns)
+        unreadable.add(path)
+        return _empty_frame(columns)
+
+def save_excel(df, path, new_rows=0):
+    """
+    Saves the given DataFrame to the Parquet file backing the specified path.
+    If only the last new_rows rows changed since the previous save, they are
+    appended as a separate part instead of rewriting the whole file; parts are
+    folded back in by the next full save. Returns whether the save succeeded.
+    """
+    if path in st.session_state.get("unreadable_stores", ()):
+        st.error(f"❌ Not saved: the existing data for {path} could not be loaded, and saving would overwrite it. Fix the file and reload the page.")
+        return False
+    try:
+        with _write_lock:
+            if new_rows and os.path.exists(_path_for(path)) and len(_append_parts(path)) < MAX_APPEND_PARTS:
+                _append_parquet(df.tail(new_rows), path)
+            else:
+                _write_parquet(df, path)
+        _load_cached.clear()
+        if not st.session_state.get("save_notified"):
+            st.success(f"✅ Data saved to {_path_for(path)}")
+            st.session_state.save_notified = True
+        return True
+    except Exception as e:
+        st.error(f"❌ Failed to save data: {e}")
+        return False
+
+save_to_excel = save_excel
+
+def _export_frame(df):
+    """
+    Drops empty rows and formats date columns as text for people reading the workbook.
+    """
+    out = df.dropna(how="all").copy()
+    for c, fmt in DATE_FORMATS.items():
+        if c in out.columns:
+            out[c] = out[c].dt.strftime(fmt)
+    return out
+
+def excel_bytes(df):
+    """
+    Returns the given DataFrame as xlsx file contents, for download buttons.
+    """
+    buffer = BytesIO()
+    _export_frame(df).to_excel(buffer, index=False, engine="xlsxwriter")
+    return buffer.getvalue()
 
-def save_to_excel(df, path):
+def export_excel(df, path):
     """
-    Saves the given DataFrame to an Excel file at the specified path.
+    Writes the given DataFrame to a human-readable Excel file at the specified path.
     """
     try:
-        df.to_excel(path, index=False)
-        st.success(f"✅ Data saved to {path}")
+        _export_frame(df).to_excel(path, index=False, engine="xlsxwriter")
+        st.success(f"✅ Data exported to {path}")
     except Exception as e:
-        st.error(f"❌ Failed to save Excel file: {e}")
+        st.error(f"❌ Failed to export Excel file: {e}")
@@ -1,34 +1,114 @@
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import pandas as pd
+
+TASK_SCHEMA = {
+    "ID No": "int32[pyarrow]",
+    "AREA": "string[pyarrow]",
+    "Site": "string[pyarrow]",
+    "MOC No": "string[pyarrow]",
+    "Assigned Dept": "string[pyarrow]",
+    "Assigned Contractor": "string[pyarrow]",
+    "Project Number": "string[pyarrow]",
+    "Project Name": "string[pyarrow]",
+    "Project Title": "string[pyarrow]",
+    "Project Manager": "string[pyarrow]",
+    "MOC Coordinator": "string[pyarrow]",
+    "Brief Description": "string[pyarrow]",
+    "Deliverables": "string[pyarrow]",
+    "Deliverables Location": "string[pyarrow]",
+    "Target Finish": "datetime64[ns]",
+    "Progress": "string[pyarrow]",
+    "Condition": "string[pyarrow]",
+    "Action Holder": "string[pyarrow]",
+    "STATUS": "string[pyarrow]",
+    "Last Update": "datetime64[ns]",
+}
+
+# Date columns and the text format used when they are written out for people
+DATE_FORMATS = {
+    "Target Finish": "%Y-%m-%d",
+    "Last Update": "%Y-%m-%d %H:%M",
+}
+DATE_COLS = list(DATE_FORMATS)
+
+# Fixed lookup tables, built once at import rather than on every Streamlit rerun
+TASK_COLUMNS = tuple(TASK_SCHEMA)
+AREA_OPTIONS = ("Water", "South", "North", "Other")
+DEPT_OPTIONS = ("Eng", "Ops", "QA", "Other")
+CONDITION_OPTIONS = ("Open", "Closed", "In Progress")
 
 def get_next_id(df):
     if "ID No" in df.columns:
-        return int(df["ID No"].max()) + 1 if not df.empty else 1
+        return int(pd.to_numeric(df["ID No"]).max()) + 1 if not df.empty else 1
     else:
         raise ValueError("'ID No' column not found in uploaded Excel file.")
 
 def track_changes(current, previous):
-    return any(current.get(k) != previous.get(k) for k in current)
+    try:
+        return frozenset(current.items()) != frozenset((k, previous.get(k)) for k in current)
+    except TypeError:
+        # Unhashable values (e.g. lists) fall back to comparing key by key
+        return any(current.get(k) != previous.get(k) for k in current)
+
+@dataclass(slots=True, frozen=True)
+class TaskEntry:
+    """
+    One task row; fields follow the column order of TASK_SCHEMA.
+    """
+    id_no: int
+    area: str
+    site: str
+    moc_no: str
+    assigned_dept: str
+    contractor: str
+    project_number: str
+    project_name: str
+    project_title: str
+    project_manager: str
+    moc_coordinator: str
+    brief_description: str
+    deliverables: str
+    deliverables_location: str
+    target_finish: date
+    progress: str
+    condition: str
+    action_holder: str
+    status: str
+    last_update: datetime
+
+def _task_record(form_data, task_id, last_update):
+    return TaskEntry(
+        id_no=task_id,
+        area=form_data["area"],
+        site=form_data["site"],
+        moc_no=form_data["moc_no"],
+        assigned_dept=form_data["assigned_dept"],
+        contractor=form_data["contractor"],
+        project_number=form_data["project_number"],
+        project_name=form_data["project_name"],
+        project_title=form_data["project_title"],
+        project_manager=form_data["project_manager"],
+        moc_coordinator=form_data["moc_coordinator"],
+        brief_description=form_data["brief_description"],
+        deliverables=form_data["deliverables"],
+        deliverables_location=form_data["deliverables_location"],
+        target_finish=form_data["target_finish"],
+        progress=form_data["progress"],
+        condition=form_data["condition"],
+        action_holder=form_data["action_holder"],
+        status=form_data["status"],
+        last_update=last_update
+    )
+
+def tasks_to_frame(tasks):
+    """
+    Builds a DataFrame typed with TASK_SCHEMA from a list of TaskEntry objects.
+    """
+    # Plain attribute reads; astuple would deep-copy every field
+    rows = [tuple(getattr(t, f) for f in t.__slots__) for t in tasks]
+    return pd.DataFrame(rows, columns=TASK_COLUMNS).astype(TASK_SCHEMA)
 
 def create_task_entry(form_data, next_id):
-    return {
-        "ID No": next_id,
-        "AREA": form_data["area"],
-        "Site": form_data["site"],
-        "MOC No": form_data["moc_no"],
-        "Assigned Dept": form_data["assigned_dept"],
-        "Assigned Contractor": form_data["contractor"],
-        "Project Number": form_data["project_number"],
-        "Project Name": form_data["project_name"],
-        "Project Title": form_data["project_title"],
-        "Project Manager": form_data["project_manager"],
-        "MOC Coordinator": form_data["moc_coordinator"],
-        "Brief Description": form_data["brief_description"],
-        "Deliverables": form_data["deliverables"],
-        "Deliverables Location": form_data["deliverables_location"],
-        "Target Finish": form_data["target_finish"].strftime("%Y-%m-%d"),
-        "Progress": form_data["progress"],
-        "Condition": form_data["condition"],
-        "Action Holder": form_data["action_holder"],
-        "STATUS": form_data["status"],
-        "Last Update": datetime.now().strftime("%Y-%m-%d %H:%M")
-    }
+    return _task_record(form_data, next_id, datetime.now().replace(second=0, microsecond=0))
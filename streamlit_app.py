@@ -1,55 +1,90 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 
-from form_manager import get_next_id, create_task_entry, track_changes
-from excel_manager import load_excel, save_to_excel
+from form_manager import (
+    TASK_COLUMNS, AREA_OPTIONS, DEPT_OPTIONS, CONDITION_OPTIONS,
+    get_next_id, create_task_entry, tasks_to_frame
+)
+from excel_manager import excel_bytes, load_excel, read_uploaded_workbook, save_to_excel
 from ui_components import show_unsaved_prompt
 
 EXCEL_PATH = "MOC_Tasks.xlsx"
-COLUMNS = [
-    "ID No", "AREA", "Site", "MOC No", "Assigned Dept", "Assigned Contractor",
-    "Project Number", "Project Name", "Project Title", "Project Manager",
-    "MOC Coordinator", "Brief Description", "Deliverables", "Deliverables Location",
-    "Target Finish", "Progress", "Condition", "Action Holder", "STATUS", "Last Update"
-]
+
+def combine_tasks(task_df, pending_tasks):
+    """
+    Returns task_df with the given pending tasks appended.
+    """
+    if not pending_tasks:
+        return task_df
+    return pd.concat([task_df, tasks_to_frame(pending_tasks)], ignore_index=True)
+
+def flush_pending_tasks():
+    """
+    Folds tasks added since the last flush into task_df with a single concat.
+    """
+    if st.session_state.pending_tasks:
+        st.session_state.task_df = combine_tasks(st.session_state.task_df, st.session_state.pending_tasks)
+        st.session_state.pending_tasks = []
+
+def stored_moc_options():
+    """
+    Returns the distinct MOC numbers in task_df, recomputed only when task_df is replaced.
+    """
+    cached = st.session_state.get("moc_options")
+    if cached is None or cached[0] is not st.session_state.task_df:
+        cached = (st.session_state.task_df, st.session_state.task_df["MOC No"].dropna().unique())
+        st.session_state.moc_options = cached
+    return cached[1]
+
+def mark_dirty():
+    """
+    Flags task_df for saving; the write happens once at the end of the run.
+    """
+    st.session_state.dirty = True
 
 st.sidebar.header("📂 Upload Existing Data")
 uploaded_file = st.sidebar.file_uploader("Choose an Excel file", type=["xlsx"])
 
-if uploaded_file:
-    st.session_state.task_df = pd.read_excel(uploaded_file)
+# Load data only when the source changes; reruns reuse the session copy
+task_source = uploaded_file.file_id if uploaded_file else EXCEL_PATH
+if st.session_state.get("task_source") != task_source:
+    if uploaded_file:
+        st.session_state.task_df = read_uploaded_workbook(uploaded_file)
+    else:
+        st.session_state.task_df = load_excel(EXCEL_PATH, TASK_COLUMNS)
+    st.session_state.task_source = task_source
+    st.session_state.pending_tasks = []
+    st.session_state.store_in_sync = True
+
+    if not st.session_state.task_df.empty:
+        st.session_state.next_id = get_next_id(st.session_state.task_df)
+    else:
+        st.session_state.next_id = 1
+
+# An unreadable upload has already reported its error and loaded no rows
+if uploaded_file and not st.session_state.task_df.empty:
     st.success("✅ Excel file loaded successfully.")
     st.dataframe(st.session_state.task_df.head(10))  # Preview first 10 rows
-else:
-    st.session_state.task_df = load_excel(EXCEL_PATH, COLUMNS)
 
 st.set_page_config(page_title="MOC Task Manager", layout="wide")
 st.title("⚡ MOC Electrical Task Manager")
 
-# Load Excel data
-if "task_df" not in st.session_state:
-    st.session_state.task_df = load_excel(EXCEL_PATH, COLUMNS)
-
 if "form_modified" not in st.session_state:
     st.session_state.form_modified = False
 
-if not st.session_state.task_df.empty:
-    next_id = get_next_id(st.session_state.task_df)
-else:
-    next_id = 1
+next_id = st.session_state.next_id
 
 # Entry Mode
 st.header("📥 Entry Mode")
 with st.form("moc_entry_form"):
     st.markdown(f"**Next Task ID:** `{next_id}`")
     col1, col2, col3 = st.columns(3)
-    area = col1.selectbox("AREA", ["Water", "South", "North", "Other"])
+    area = col1.selectbox("AREA", AREA_OPTIONS)
     site = col2.text_input("Site")
     moc_no = col3.text_input("MOC No")
 
     col4, col5, col6 = st.columns(3)
-    assigned_dept = col4.selectbox("Assigned Dept", ["Eng", "Ops", "QA", "Other"])
+    assigned_dept = col4.selectbox("Assigned Dept", DEPT_OPTIONS)
     contractor = col5.text_input("Assigned Contractor / Engineer")
     project_number = col6.text_input("Project Number")
 
@@ -68,7 +103,7 @@ with st.form("moc_entry_form"):
     col12, col13, col14, col15 = st.columns(4)
     target_finish = col12.date_input("Target Finish")
     progress = col13.text_input("Progress")
-    condition = col14.selectbox("Condition", ["Open", "Closed", "In Progress"])
+    condition = col14.selectbox("Condition", CONDITION_OPTIONS)
     action_holder = col15.text_input("Action Holder")
 
     status = st.text_input("STATUS")
@@ -78,16 +113,23 @@ with st.form("moc_entry_form"):
 st.header("🗑️ Delete Task")
 
 # Choose a task to delete by MOC No
-if not st.session_state.task_df.empty:
-    moc_options = st.session_state.task_df["MOC No"].dropna().unique().tolist()
+if not st.session_state.task_df.empty or st.session_state.pending_tasks:
+    # dict.fromkeys de-duplicates by hash while keeping the stored order first
+    moc_options = list(dict.fromkeys([
+        *stored_moc_options(),
+        *(t.moc_no for t in st.session_state.pending_tasks)
+    ]))
     selected_moc = st.selectbox("Select MOC No to delete", moc_options)
 
     if st.button("❌ Delete Selected Task"):
+        flush_pending_tasks()
         before_count = len(st.session_state.task_df)
-        st.session_state.task_df = st.session_state.task_df[st.session_state.task_df["MOC No"] != selected_moc]
+        # Rows without an MOC No compare as <NA>; keep them rather than letting the mask drop them
+        keep = st.session_state.task_df["MOC No"].ne(selected_moc).fillna(True)
+        st.session_state.task_df = st.session_state.task_df[keep]
         after_count = len(st.session_state.task_df)
 
-        save_to_excel(st.session_state.task_df, EXCEL_PATH)
+        mark_dirty()
         st.success(f"✅ Deleted task '{selected_moc}' ({before_count - after_count} row removed)")
 else:
     st.info("No tasks available to delete.")
@@ -115,17 +157,41 @@ if submitted:
         "status": status
     }
 
-    new_task = create_task_entry(form_data, next_id)
-    st.session_state.task_df = pd.concat(
-        [st.session_state.task_df, pd.DataFrame([new_task])],
-        ignore_index=True
-    )
+    st.session_state.pending_tasks.append(create_task_entry(form_data, next_id))
+    st.session_state.next_id += 1
     st.session_state.form_modified = True
     st.success(f"✅ Task '{moc_no}' added.")
 
 # Save prompt
+save_clicked = False
 if st.session_state.form_modified:
     if show_unsaved_prompt():
-        save_to_excel(st.session_state.task_df, EXCEL_PATH)
+        mark_dirty()
+        save_clicked = True
+
+# Single trailing write for everything changed during this run
+if st.session_state.pop("dirty", False):
+    # Rows added on top of the local store can be appended without a full rewrite,
+    # unless an earlier save failed and the store no longer matches task_df
+    appendable = task_source == EXCEL_PATH and st.session_state.store_in_sync
+    new_rows = len(st.session_state.pending_tasks) if appendable else 0
+    flush_pending_tasks()
+    # save_to_excel announces only the first save of a session; confirm later ones here
+    announced = st.session_state.get("save_notified", False)
+    saved = save_to_excel(st.session_state.task_df, EXCEL_PATH, new_rows=new_rows)
+    st.session_state.store_in_sync = saved
+    if saved and save_clicked:
         st.session_state.form_modified = False
-        st.success("✅ Changes saved to Excel.")
+        if announced:
+            st.success("✅ Changes saved.")
+
+# The xlsx file is only built when the button is clicked; the callable runs
+# outside the script, so it gets its own references to the current tasks
+export_df, export_pending = st.session_state.task_df, list(st.session_state.pending_tasks)
+st.download_button(
+    "📤 Download Excel",
+    data=lambda: excel_bytes(combine_tasks(export_df, export_pending)),
+    file_name=EXCEL_PATH,
+    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    disabled=export_df.empty and not export_pending
+)
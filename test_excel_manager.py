@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+
+import excel_manager
+from excel_manager import _append_parquet, _append_parts, _apply_schema, load_excel, save_excel
+
+COLUMNS = ["ID No", "MOC No"]
+
+def _tasks(*moc_nos):
+    return _apply_schema(pd.DataFrame({"ID No": range(1, len(moc_nos) + 1), "MOC No": list(moc_nos)}))
+
+def _loaded(path):
+    return load_excel(path, COLUMNS)["MOC No"].tolist()
+
+def test_append_writes_only_new_rows(tmp_path):
+    path = str(tmp_path / "Tasks.xlsx")
+    assert save_excel(_tasks("A", "B"), path)
+    assert save_excel(_tasks("A", "B", "C"), path, new_rows=1)
+
+    parts = _append_parts(path)
+    assert len(parts) == 1
+    assert pd.read_parquet(parts[0])["MOC No"].tolist() == ["C"]
+    assert _loaded(path) == ["A", "B", "C"]
+
+def test_full_save_folds_parts(tmp_path):
+    path = str(tmp_path / "Tasks.xlsx")
+    save_excel(_tasks("A"), path)
+    save_excel(_tasks("A", "B"), path, new_rows=1)
+    save_excel(_tasks("A", "B", "C"), path, new_rows=1)
+
+    assert save_excel(_tasks("A", "C"), path)
+    assert _append_parts(path) == []
+    assert _loaded(path) == ["A", "C"]
+
+def test_appends_roll_over_to_full_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_manager, "MAX_APPEND_PARTS", 2)
+    path = str(tmp_path / "Tasks.xlsx")
+    save_excel(_tasks("A"), path)
+    save_excel(_tasks("A", "B"), path, new_rows=1)
+    save_excel(_tasks("A", "B", "C"), path, new_rows=1)
+    assert len(_append_parts(path)) == 2
+
+    save_excel(_tasks("A", "B", "C", "D"), path, new_rows=1)
+    assert _append_parts(path) == []
+    assert _loaded(path) == ["A", "B", "C", "D"]
+
+def test_parts_left_after_fold_are_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / "Tasks.xlsx")
+    save_excel(_tasks("A"), path)
+    save_excel(_tasks("A", "B"), path, new_rows=1)
+
+    # Simulate dying after the main file was replaced but before parts were removed
+    with monkeypatch.context() as m:
+        m.setattr(excel_manager.os, "remove", lambda part: None)
+        save_excel(_tasks("A", "B"), path)
+    assert len(_append_parts(path)) == 1
+    assert _loaded(path) == ["A", "B"]
+
+    save_excel(_tasks("A", "B", "C"), path, new_rows=1)
+    assert _loaded(path) == ["A", "B", "C"]
+
+def test_load_sees_parts_written_by_another_process(tmp_path):
+    path = str(tmp_path / "Tasks.xlsx")
+    save_excel(_tasks("A"), path)
+    assert _loaded(path) == ["A"]
+
+    # Bypasses save_excel, so only the changed modification times invalidate the cache
+    _append_parquet(_tasks("A", "B").tail(1), path)
+    assert os.path.isdir(excel_manager._appends_dir(path))
+    assert _loaded(path) == ["A", "B"]
@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from form_manager import TASK_COLUMNS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _app_dir(tmp_path, monkeypatch):
+    for name in ("streamlit_app.py", "form_manager.py", "excel_manager.py", "ui_components.py"):
+        shutil.copy(os.path.join(APP_DIR, name), tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+def _run_app(tmp_path):
+    return AppTest.from_file(str(tmp_path / "streamlit_app.py"), default_timeout=30).run()
+
+def _click(at, label):
+    next(b for b in at.button if label in b.label).click().run()
+
+def _add_task(at, moc_no):
+    next(t for t in at.text_input if t.label == "MOC No").input(moc_no)
+    _click(at, "Add Task")
+
+def _legacy_sheet(moc_nos, target_finish=None):
+    rows = [{c: None for c in TASK_COLUMNS} for _ in moc_nos]
+    for i, row in enumerate(rows):
+        row["ID No"] = i + 1
+        row["Site"] = f"S{i + 1}"
+        row["MOC No"] = moc_nos[i]
+        if target_finish:
+            row["Target Finish"] = target_finish[i]
+    pd.DataFrame(rows).to_excel("MOC_Tasks.xlsx", index=False)
+
+def test_delete_keeps_rows_without_moc_no(tmp_path, monkeypatch):
+    _app_dir(tmp_path, monkeypatch)
+    _legacy_sheet(["M1", None, "M3"])
+
+    at = _run_app(tmp_path)
+    next(s for s in at.selectbox if "delete" in s.label).select("M1")
+    _click(at, "Delete")
+
+    assert not at.exception
+    saved = pd.read_parquet("MOC_Tasks.parquet")
+    assert saved["ID No"].tolist() == [2, 3]
+
+def test_unreadable_legacy_sheet_is_not_overwritten(tmp_path, monkeypatch):
+    _app_dir(tmp_path, monkeypatch)
+    _legacy_sheet(["L0", "L1", "L2"], ["2025-01-01", "TBD", "2025-03-01"])
+
+    at = _run_app(tmp_path)
+    assert "rows 3" in at.error[0].value
+    _add_task(at, "N1")
+    _click(at, "Save")
+    assert not os.path.exists("MOC_Tasks.parquet")
+
+    _legacy_sheet(["L0", "L1", "L2"], ["2025-01-01", "2025-02-01", "2025-03-01"])
+    at = _run_app(tmp_path)
+    assert at.session_state.task_df["MOC No"].tolist() == ["L0", "L1", "L2"]
+
+def test_save_after_failed_append_rewrites_store(tmp_path, monkeypatch):
+    _app_dir(tmp_path, monkeypatch)
+
+    at = _run_app(tmp_path)
+    _add_task(at, "A1")
+    _click(at, "Save")
+
+    # A file where the appends directory should be makes the next append fail
+    open("MOC_Tasks_appends", "w").close()
+    _add_task(at, "A2")
+    _click(at, "Save")
+    assert at.error
+    os.remove("MOC_Tasks_appends")
+
+    _add_task(at, "A3")
+    _click(at, "Save")
+    assert not at.error
+
+    at = _run_app(tmp_path)
+    assert at.session_state.task_df["MOC No"].tolist() == ["A1", "A2", "A3"]